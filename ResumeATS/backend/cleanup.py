@@ -9,32 +9,84 @@ Usage:
     python cleanup.py --uploads-only     # Only clean uploads folder
     python cleanup.py --logs-only        # Only clean old logs
     python cleanup.py --days 7           # Clean files older than 7 days
+    python cleanup.py --parallel         # Delete using a thread pool (large backlogs)
 """
 
 import os
 import shutil
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from pathlib import Path
 
+PARALLEL_UNLINK_WORKERS = 8
 
-def get_file_age_days(file_path):
-    """Get the age of a file in days"""
-    file_time = os.path.getmtime(file_path)
-    file_date = datetime.fromtimestamp(file_time)
+
+def get_file_age_days(st):
+    """Get the age of a file in days from its stat result"""
+    file_date = datetime.fromtimestamp(st.st_mtime)
     age = datetime.now() - file_date
     return age.days
 
 
-def clean_uploads(force=False, days_old=0):
+def scan_files(directory, suffix=""):
+    """List regular files in a directory as (entry, stat) pairs, filtering names by suffix"""
+    with os.scandir(directory) as it:
+        return [(entry, entry.stat(follow_symlinks=False)) for entry in it
+                if entry.name.endswith(suffix) and entry.is_file(follow_symlinks=False)]
+
+
+def delete_entries(directory, entries, parallel=False):
+    """Delete scandir entries, unlinking relative to one directory fd where supported"""
+    # unlinkat() against a single directory fd skips per-file path resolution.
+    # O_DIRECTORY makes the open fail if the path was swapped for a non-directory.
+    # Windows has no dir_fd support and falls back to unlinking by path.
+    if os.unlink in os.supports_dir_fd:
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    else:
+        dir_fd = None
+    
+    def unlink(entry):
+        try:
+            if dir_fd is not None:
+                os.unlink(entry.name, dir_fd=dir_fd)
+            else:
+                os.unlink(entry.path)
+            return None
+        except Exception as e:
+            return e
+    
+    deleted = 0
+    try:
+        if parallel:
+            # Overlap the unlink syscalls across threads; only pays off for large backlogs
+            with ThreadPoolExecutor(max_workers=PARALLEL_UNLINK_WORKERS) as executor:
+                errors = list(executor.map(unlink, entries))
+        else:
+            errors = map(unlink, entries)
+        
+        for entry, error in zip(entries, errors):
+            if error is None:
+                deleted += 1
+                print(f"  ✓ Deleted: {entry.name}")
+            else:
+                print(f"  ✗ Error deleting {entry.name}: {error}")
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    
+    return deleted
+
+
+def clean_uploads(force=False, days_old=0, parallel=False):
     """Clean the uploads directory"""
-    uploads_dir = Path("uploads")
+    uploads_dir = "uploads"
     
-    if not uploads_dir.exists():
+    if not os.path.isdir(uploads_dir):
         print("✓ No uploads directory found. Nothing to clean.")
         return 0
     
-    files = list(uploads_dir.glob("*"))
+    # Stat each file once and reuse the result for filtering and reporting
+    files = scan_files(uploads_dir)
     
     if not files:
         print("✓ Uploads directory is already empty.")
@@ -42,16 +94,16 @@ def clean_uploads(force=False, days_old=0):
     
     # Filter by age if specified
     if days_old > 0:
-        files = [f for f in files if f.is_file() and get_file_age_days(f) >= days_old]
+        files = [(f, st) for f, st in files if get_file_age_days(st) >= days_old]
     
     if not files:
         print(f"✓ No files older than {days_old} days found in uploads.")
         return 0
     
     print(f"\n📁 Found {len(files)} file(s) in uploads directory:")
-    for f in files:
-        age = get_file_age_days(f) if f.is_file() else 0
-        size = f.stat().st_size if f.is_file() else 0
+    for f, st in files:
+        age = get_file_age_days(st)
+        size = st.st_size
         print(f"  - {f.name} ({size:,} bytes, {age} days old)")
     
     if not force:
@@ -60,45 +112,37 @@ def clean_uploads(force=False, days_old=0):
             print("❌ Cleanup cancelled.")
             return 0
     
-    deleted = 0
-    for f in files:
-        try:
-            if f.is_file():
-                f.unlink()
-                deleted += 1
-                print(f"  ✓ Deleted: {f.name}")
-        except Exception as e:
-            print(f"  ✗ Error deleting {f.name}: {e}")
+    deleted = delete_entries(uploads_dir, [f for f, _ in files], parallel=parallel)
     
     print(f"\n✅ Deleted {deleted} file(s) from uploads directory.")
     return deleted
 
 
-def clean_logs(force=False, days_old=30):
+def clean_logs(force=False, days_old=30, parallel=False):
     """Clean old log files"""
-    logs_dir = Path("logs")
+    logs_dir = "logs"
     
-    if not logs_dir.exists():
+    if not os.path.isdir(logs_dir):
         print("✓ No logs directory found. Nothing to clean.")
         return 0
     
-    log_files = list(logs_dir.glob("*.log"))
+    log_files = scan_files(logs_dir, suffix=".log")
     
     if not log_files:
         print("✓ No log files found.")
         return 0
     
     # Filter by age
-    old_logs = [f for f in log_files if get_file_age_days(f) >= days_old]
+    old_logs = [(f, st) for f, st in log_files if get_file_age_days(st) >= days_old]
     
     if not old_logs:
         print(f"✓ No log files older than {days_old} days found.")
         return 0
     
     print(f"\n📋 Found {len(old_logs)} old log file(s):")
-    for f in old_logs:
-        age = get_file_age_days(f)
-        size = f.stat().st_size
+    for f, st in old_logs:
+        age = get_file_age_days(st)
+        size = st.st_size
         print(f"  - {f.name} ({size:,} bytes, {age} days old)")
     
     if not force:
@@ -107,14 +151,7 @@ def clean_logs(force=False, days_old=30):
             print("❌ Cleanup cancelled.")
             return 0
     
-    deleted = 0
-    for f in old_logs:
-        try:
-            f.unlink()
-            deleted += 1
-            print(f"  ✓ Deleted: {f.name}")
-        except Exception as e:
-            print(f"  ✗ Error deleting {f.name}: {e}")
+    deleted = delete_entries(logs_dir, [f for f, _ in old_logs], parallel=parallel)
     
     print(f"\n✅ Deleted {deleted} log file(s).")
     return deleted
@@ -132,6 +169,7 @@ Examples:
   python cleanup.py --logs-only        # Only clean old logs
   python cleanup.py --days 7           # Clean uploads older than 7 days
   python cleanup.py --log-days 60      # Clean logs older than 60 days
+  python cleanup.py --parallel         # Delete using a thread pool (large backlogs)
         """
     )
     
@@ -145,6 +183,8 @@ Examples:
                         help='Only delete uploads older than N days (default: 0 = all)')
     parser.add_argument('--log-days', type=int, default=30,
                         help='Only delete logs older than N days (default: 30)')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Delete files from a thread pool (faster for thousands of files)')
     
     args = parser.parse_args()
     
@@ -157,12 +197,12 @@ Examples:
     # Clean uploads
     if not args.logs_only:
         print("\n📂 Checking uploads directory...")
-        total_deleted += clean_uploads(force=args.force, days_old=args.days)
+        total_deleted += clean_uploads(force=args.force, days_old=args.days, parallel=args.parallel)
     
     # Clean logs
     if not args.uploads_only:
         print("\n📝 Checking log files...")
-        total_deleted += clean_logs(force=args.force, days_old=args.log_days)
+        total_deleted += clean_logs(force=args.force, days_old=args.log_days, parallel=args.parallel)
     
     print("\n" + "=" * 60)
     print(f"🎉 Cleanup complete! Total files deleted: {total_deleted}")
@@ -1,17 +1,29 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from PyPDF2 import PdfReader
+from fastapi.responses import FileResponse, JSONResponse
+import pypdfium2 as pdfium
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from diskcache import Cache
+import httpx
+import orjson
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.enums import TA_LEFT
-import json
+from rag_engine import RAGEngine
+import asyncio
+import atexit
+import hashlib
+import io
 import os
 import logging
+import logging.handlers
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional
 
@@ -22,15 +34,22 @@ os.makedirs(log_dir, exist_ok=True)
 # Create log filename based on current date
 log_filename = os.path.join(log_dir, f"app_{datetime.now().strftime('%Y-%m-%d')}.log")
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_filename),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging. File and console writes happen on a QueueListener thread,
+# so a log call on the request path only enqueues the record
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+file_handler = logging.handlers.RotatingFileHandler(log_filename, maxBytes=10 * 1024 * 1024, backupCount=5)
+file_handler.setFormatter(log_formatter)
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(log_formatter)
+
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
 logger = logging.getLogger(__name__)
 logger.info(f"Logging to file: {log_filename}")
 
@@ -40,7 +59,24 @@ load_dotenv(dotenv_path=env_path)
 logger.info(f"Loading .env from: {env_path}")
 logger.info("Application starting up...")
 
-app = FastAPI()
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, which is faster than the stdlib encoder"""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pruner = asyncio.create_task(prune_faiss_indexes_periodically())
+    tokenizer_loader = asyncio.create_task(load_token_encoding_with_retry())
+    yield
+    pruner.cancel()
+    tokenizer_loader.cancel()
+    # Close pooled connections to the OpenAI API on shutdown
+    await client.close()
+    rag_engine.close()
+    logger.info("OpenAI client and RAG engine closed")
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -66,28 +102,166 @@ async def root():
         }
     }
 
-# Initialize OpenAI and RAG Engine
+# Initialize OpenAI and RAG Engine. The key is validated once here so handlers never re-check it
 api_key = os.getenv("OPENAI_API_KEY")
-if api_key:
-    logger.info("OpenAI API key found, configuring client...")
-    client = OpenAI(api_key=api_key)
-    logger.info("OpenAI client initialized successfully")
-    
-    # Initialize RAG Engine
-    from rag_engine import RAGEngine
-    rag_engine = RAGEngine(api_key=api_key)
-    logger.info("RAG Engine initialized successfully")
-else:
-    logger.warning("OpenAI API key not found in environment variables")
-    client = None
-    rag_engine = None
-
-def analyze_with_openai(resume_text: str) -> dict:
-    """Use OpenAI to analyze resume and provide suggestions"""
-    logger.info("Starting OpenAI analysis...")
-    logger.debug(f"Resume text length: {len(resume_text)} characters")
-    
-    prompt = f"""You are an expert ATS (Applicant Tracking System) resume analyzer and career coach. Analyze the following resume comprehensively and provide a detailed analysis in JSON format.
+if not api_key:
+    logger.error("OpenAI API key not found in environment variables")
+    raise RuntimeError("OPENAI_API_KEY is required. Set it in backend/.env")
+
+logger.info("OpenAI API key found, configuring client...")
+# One shared client: HTTP/2 multiplexes concurrent completions over a pooled connection
+client = AsyncOpenAI(
+    api_key=api_key,
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+)
+logger.info("OpenAI client initialized successfully")
+
+# Initialize RAG Engine
+rag_engine = RAGEngine(api_key=api_key)
+logger.info("RAG Engine initialized successfully")
+
+# Bound in-flight completions so bursts queue here instead of tripping OpenAI rate limits
+openai_semaphore = asyncio.Semaphore(int(os.getenv("OPENAI_MAX_CONCURRENCY", "10")))
+
+async def create_chat_completion(**kwargs):
+    """Create a chat completion, waiting for a free slot in openai_semaphore"""
+    async with openai_semaphore:
+        return await client.chat.completions.create(**kwargs)
+
+# Uploads are parsed in memory; set PERSIST_UPLOADS=true to keep a copy on disk for debugging
+PERSIST_UPLOADS = os.getenv("PERSIST_UPLOADS", "false").lower() in ("1", "true", "yes")
+if PERSIST_UPLOADS:
+    os.makedirs("uploads", exist_ok=True)
+
+# Converted resumes are written here; created once at startup rather than per request
+output_dir = "generated"
+os.makedirs(output_dir, exist_ok=True)
+
+# Content-addressed cache for extracted PDF text and OpenAI analyses, so re-uploads skip the work
+cache = Cache("cache")
+
+def content_hash(data: bytes) -> str:
+    """Short blake2b digest used as a cache key"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+# Uploads are read in chunks and rejected as soon as they exceed this size
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def is_pdf_filename(filename: Optional[str]) -> bool:
+    """Case-insensitive .pdf extension check that tolerates a missing filename"""
+    return (filename or "").lower().endswith(".pdf")
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an uploaded file, failing fast with 413 once it passes MAX_PDF_BYTES"""
+    buf = io.BytesIO()
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_PDF_BYTES:
+            raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {MAX_PDF_BYTES:,} bytes")
+        buf.write(chunk)
+    return buf.getvalue()
+
+def save_upload(filename: str, contents: bytes) -> str:
+    """Write an uploaded file to the uploads folder (debugging only)"""
+    path = f"uploads/{filename}"
+    with open(path, "wb") as f:
+        f.write(contents)
+    return path
+
+# PDFium is not thread-safe, so extraction from to_thread workers is serialized
+pdfium_lock = threading.Lock()
+
+# RAGEngine holds the current request's index in memory, so analyses run one at a time
+rag_lock = asyncio.Lock()
+
+async def analyze_with_rag(resume_text: str, job_description: Optional[str] = None) -> dict:
+    """Run a RAG analysis; only indexing and retrieval hold rag_lock, the completion runs outside it"""
+    async with rag_lock:
+        prepared = await asyncio.to_thread(rag_engine.prepare_rag_analysis, resume_text, job_description)
+    
+    response = await create_chat_completion(**prepared["request"])
+    analysis = orjson.loads(response.choices[0].message.content)
+    analysis["faiss_index_name"] = prepared["faiss_index_name"]
+    analysis["total_chunks_indexed"] = prepared["total_chunks_indexed"]
+    return analysis
+
+# Saved indexes are named by resume/JD content and reused, so old ones are pruned in the background
+FAISS_INDEX_RETENTION_DAYS = int(os.getenv("FAISS_INDEX_RETENTION_DAYS", "7"))
+INDEX_PRUNE_INTERVAL_SECONDS = 3600
+
+async def prune_faiss_indexes_periodically():
+    """Delete saved FAISS indexes older than FAISS_INDEX_RETENTION_DAYS, once an hour"""
+    while True:
+        try:
+            async with rag_lock:
+                deleted_count = await asyncio.to_thread(rag_engine.prune_indexes, FAISS_INDEX_RETENTION_DAYS)
+            if deleted_count:
+                logger.info(f"Pruned {deleted_count} FAISS indexes older than {FAISS_INDEX_RETENTION_DAYS} days")
+        except Exception as e:
+            logger.warning(f"FAISS index pruning failed: {e}")
+        await asyncio.sleep(INDEX_PRUNE_INTERVAL_SECONDS)
+
+# Until the tokenizer loads, long chunks are split by characters; retries back off up to an hour
+TOKENIZER_RETRY_INITIAL_SECONDS = 30
+TOKENIZER_RETRY_MAX_SECONDS = 3600
+
+async def load_token_encoding_with_retry():
+    """Load the RAG tokenizer in a worker thread at startup, retrying with backoff until it succeeds"""
+    delay = TOKENIZER_RETRY_INITIAL_SECONDS
+    while not await asyncio.to_thread(rag_engine.load_token_encoding):
+        logger.warning(f"Tokenizer unavailable, retrying in {delay}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, TOKENIZER_RETRY_MAX_SECONDS)
+
+def extract_pdf_text(contents: bytes) -> tuple:
+    """Extract text from PDF bytes. Runs in a worker thread to keep the event loop free"""
+    cache_key = f"pdfium_text:{content_hash(contents)}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(contents)
+        try:
+            page_count = len(pdf)
+            pages_text = []
+            for i in range(page_count):
+                # Close native page handles as we go rather than waiting for the GC
+                page = pdf[i]
+                textpage = page.get_textpage()
+                pages_text.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+            text = "\n".join(pages_text)
+        finally:
+            pdf.close()
+    
+    # PDFium reports CRLF line breaks; the RAG section/paragraph splitting expects LF
+    result = (text.replace("\r\n", "\n"), page_count)
+    cache.set(cache_key, result)
+    return result
+
+# Cap on resume characters sent for analysis (~3000 tokens); longer resumes keep their head and tail
+MAX_RESUME_CHARS = int(os.getenv("MAX_RESUME_CHARS", "12000"))
+if MAX_RESUME_CHARS < 2:
+    logger.error(f"MAX_RESUME_CHARS must be at least 2, got {MAX_RESUME_CHARS}")
+    raise RuntimeError("MAX_RESUME_CHARS must be at least 2")
+
+def truncate_resume_text(text: str, limit: int = MAX_RESUME_CHARS) -> str:
+    """Drop the middle of over-long resume text, keeping the header and the closing sections"""
+    if len(text) <= limit:
+        return text
+    half = limit // 2
+    return text[:half] + "\n...[truncated]...\n" + text[len(text) - half:]
+
+# Static parts of the /analyze prompt, built once at import instead of per request
+ANALYSIS_PROMPT_PREFIX = """You are an expert ATS (Applicant Tracking System) resume analyzer and career coach. Analyze the following resume comprehensively and provide a detailed analysis in JSON format.
 
 IMPORTANT: Provide an ATS score between 1-100 based on:
 - Keyword optimization and relevance
@@ -99,15 +273,15 @@ IMPORTANT: Provide an ATS score between 1-100 based on:
 
 Return JSON with these exact keys:
 
-{{
+{
   "ats_score": 75,
-  "ats_score_breakdown": {{
+  "ats_score_breakdown": {
     "keyword_optimization": 80,
     "formatting": 70,
     "content_quality": 75,
     "achievements": 65,
     "overall_presentation": 85
-  }},
+  },
   "pros": [
     "Specific strength with detailed explanation",
     "Another strength with context",
@@ -136,19 +310,48 @@ Return JSON with these exact keys:
   "top_skills": ["skill1", "skill2", "skill3", "skill4", "skill5"],
   "missing_keywords": ["keyword1", "keyword2", "keyword3"],
   "industry_match": "Industry or role this resume best fits"
-}}
+}
 
 Resume Text:
-{resume_text}
+"""
+
+ANALYSIS_PROMPT_SUFFIX = """
 
 Be specific, actionable, and honest in your analysis. Return ONLY valid JSON, no markdown formatting."""
 
+ANALYSIS_SYSTEM_MESSAGE = {"role": "system", "content": "You are an expert resume analyzer. Provide detailed, actionable feedback in JSON format."}
+ANALYSIS_MODEL = "gpt-4o-mini"
+
+# Part of every analysis cache key, so changing the prompt, model or truncation limit
+# stops old cached analyses from being served
+ANALYSIS_CACHE_VERSION = content_hash(orjson.dumps([
+    ANALYSIS_MODEL, ANALYSIS_SYSTEM_MESSAGE, ANALYSIS_PROMPT_PREFIX, ANALYSIS_PROMPT_SUFFIX, MAX_RESUME_CHARS
+]))
+
+async def analyze_with_openai(resume_text: str) -> dict:
+    """Use OpenAI to analyze resume and provide suggestions"""
+    logger.info("Starting OpenAI analysis...")
+    logger.debug("Resume text length: %d characters", len(resume_text))
+    
+    cache_key = f"analysis:{ANALYSIS_CACHE_VERSION}:{content_hash(resume_text.encode())}"
+    # Cache reads/writes are SQLite queries plus pickling, so they run in worker threads
+    cached = await asyncio.to_thread(cache.get, cache_key)
+    if cached is not None:
+        logger.info("Returning cached analysis for identical resume text")
+        return cached
+    
+    if len(resume_text) > MAX_RESUME_CHARS:
+        logger.info("Truncating resume from %d to %d characters", len(resume_text), MAX_RESUME_CHARS)
+        resume_text = truncate_resume_text(resume_text)
+    
+    prompt = ANALYSIS_PROMPT_PREFIX + resume_text + ANALYSIS_PROMPT_SUFFIX
+
     try:
         logger.info("Sending request to OpenAI API...")
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await create_chat_completion(
+            model=ANALYSIS_MODEL,
             messages=[
-                {"role": "system", "content": "You are an expert resume analyzer. Provide detailed, actionable feedback in JSON format."},
+                ANALYSIS_SYSTEM_MESSAGE,
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
@@ -158,14 +361,15 @@ Be specific, actionable, and honest in your analysis. Return ONLY valid JSON, no
         
         # Parse the response
         response_text = response.choices[0].message.content
-        logger.debug(f"Raw response length: {len(response_text)} characters")
+        logger.debug("Raw response length: %d characters", len(response_text))
         
         logger.info("Parsing JSON response...")
-        parsed_response = json.loads(response_text)
+        parsed_response = orjson.loads(response_text)
         logger.info("Successfully parsed OpenAI response")
+        await asyncio.to_thread(cache.set, cache_key, parsed_response)
         return parsed_response
         
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.error(f"JSON parsing error: {str(e)}")
         logger.error(f"Response text: {response_text[:500]}...")
         raise HTTPException(status_code=500, detail=f"Failed to parse OpenAI response: {str(e)}")
@@ -175,42 +379,34 @@ Be specific, actionable, and honest in your analysis. Return ONLY valid JSON, no
 
 @app.post("/analyze")
 async def analyze_resume(file: UploadFile = File(...)):
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    request_id = format(time.time_ns(), "x")
     logger.info(f"[{request_id}] New resume analysis request received")
     logger.info(f"[{request_id}] Filename: {file.filename}")
     
-    if not file.filename.endswith('.pdf'):
+    if not is_pdf_filename(file.filename):
         logger.warning(f"[{request_id}] Invalid file type: {file.filename}")
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    # Check if OpenAI API key is set
-    if not os.getenv("OPENAI_API_KEY"):
-        logger.error(f"[{request_id}] OpenAI API key not configured")
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
-    
     logger.info(f"[{request_id}] Reading file contents...")
-    contents = await file.read()
+    contents = await read_upload(file)
     logger.info(f"[{request_id}] File size: {len(contents)} bytes")
 
-    # Save PDF temporarily
-    os.makedirs("uploads", exist_ok=True)
-    path = f"uploads/{file.filename}"
-    logger.info(f"[{request_id}] Saving file to: {path}")
-    
-    with open(path, "wb") as f:
-        f.write(contents)
-    logger.info(f"[{request_id}] File saved successfully")
+    if PERSIST_UPLOADS:
+        path = save_upload(file.filename, contents)
+        logger.info(f"[{request_id}] File saved to: {path}")
+
+    # Identical uploads get the stored response without touching the extracted text again
+    cache_key = f"analyze_response:{ANALYSIS_CACHE_VERSION}:{content_hash(contents)}"
+    cached = await asyncio.to_thread(cache.get, cache_key)
+    if cached is not None:
+        logger.info(f"[{request_id}] Returning cached response for identical upload")
+        return {"filename": file.filename, **cached}
 
     try:
         # Read text from PDF
         logger.info(f"[{request_id}] Extracting text from PDF...")
-        reader = PdfReader(path)
-        logger.info(f"[{request_id}] PDF has {len(reader.pages)} pages")
-        
-        text = ""
-        for i, page in enumerate(reader.pages):
-            logger.debug(f"[{request_id}] Extracting text from page {i+1}")
-            text += page.extract_text()
+        text, page_count = await asyncio.to_thread(extract_pdf_text, contents)
+        logger.info(f"[{request_id}] PDF has {page_count} pages")
         
         logger.info(f"[{request_id}] Text extraction complete. Total characters: {len(text)}")
 
@@ -220,26 +416,28 @@ async def analyze_resume(file: UploadFile = File(...)):
 
         # Get AI-powered analysis
         logger.info(f"[{request_id}] Starting AI analysis...")
-        ai_analysis = analyze_with_openai(text)
+        ai_analysis = await analyze_with_openai(text)
         logger.info(f"[{request_id}] AI analysis completed successfully")
 
         # Basic metrics
         basic_metrics = {
             "word_count": len(text.split()),
-            "page_count": len(reader.pages),
+            "page_count": page_count,
             "character_count": len(text)
         }
         logger.info(f"[{request_id}] Basic metrics calculated: {basic_metrics}")
 
-        response_data = {
-            "filename": file.filename,
+        result = {
             "basic_metrics": basic_metrics,
             "ai_analysis": ai_analysis,
             "text_preview": text[:500]
         }
+        await asyncio.to_thread(cache.set, cache_key, result)
+        response_data = {"filename": file.filename, **result}
         
-        logger.info(f"[{request_id}] Response data keys: {list(response_data.keys())}")
-        logger.info(f"[{request_id}] AI analysis keys: {list(ai_analysis.keys())}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[%s] Response data keys: %s", request_id, list(response_data))
+            logger.debug("[%s] AI analysis keys: %s", request_id, list(ai_analysis))
         logger.info(f"[{request_id}] ATS Score: {ai_analysis.get('ats_score', 'N/A')}")
         logger.info(f"[{request_id}] Request completed successfully")
         return response_data
@@ -249,49 +447,33 @@ async def analyze_resume(file: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"[{request_id}] Unexpected error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    
-    # Note: Files are NOT automatically deleted. Run cleanup.py to remove old uploads.
 
 @app.post("/analyze-rag")
 async def analyze_resume_with_rag(file: UploadFile = File(...)):
     """
     RAG-based resume analysis - uses vector retrieval for grounded analysis
     """
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    request_id = format(time.time_ns(), "x")
     logger.info(f"[{request_id}] RAG-based resume analysis request received")
     logger.info(f"[{request_id}] Filename: {file.filename}")
     
-    if not file.filename.endswith('.pdf'):
+    if not is_pdf_filename(file.filename):
         logger.warning(f"[{request_id}] Invalid file type: {file.filename}")
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    if not rag_engine:
-        logger.error(f"[{request_id}] RAG Engine not initialized")
-        raise HTTPException(status_code=500, detail="RAG Engine not configured")
-    
     logger.info(f"[{request_id}] Reading file contents...")
-    contents = await file.read()
+    contents = await read_upload(file)
     logger.info(f"[{request_id}] File size: {len(contents)} bytes")
 
-    # Save PDF temporarily
-    os.makedirs("uploads", exist_ok=True)
-    path = f"uploads/{file.filename}"
-    logger.info(f"[{request_id}] Saving file to: {path}")
-    
-    with open(path, "wb") as f:
-        f.write(contents)
-    logger.info(f"[{request_id}] File saved successfully")
+    if PERSIST_UPLOADS:
+        path = save_upload(file.filename, contents)
+        logger.info(f"[{request_id}] File saved to: {path}")
 
     try:
         # Read text from PDF
         logger.info(f"[{request_id}] Extracting text from PDF...")
-        reader = PdfReader(path)
-        logger.info(f"[{request_id}] PDF has {len(reader.pages)} pages")
-        
-        text = ""
-        for i, page in enumerate(reader.pages):
-            logger.debug(f"[{request_id}] Extracting text from page {i+1}")
-            text += page.extract_text()
+        text, page_count = await asyncio.to_thread(extract_pdf_text, contents)
+        logger.info(f"[{request_id}] PDF has {page_count} pages")
         
         logger.info(f"[{request_id}] Text extraction complete. Total characters: {len(text)}")
 
@@ -301,15 +483,14 @@ async def analyze_resume_with_rag(file: UploadFile = File(...)):
 
         # Get RAG-based analysis with FAISS
         logger.info(f"[{request_id}] Starting RAG-based analysis with FAISS...")
-        index_name = f"resume_{request_id}"
-        rag_analysis = rag_engine.analyze_with_rag_faiss(text, index_name=index_name)
+        rag_analysis = await analyze_with_rag(text)
         logger.info(f"[{request_id}] RAG analysis completed successfully")
-        logger.info(f"[{request_id}] FAISS index saved: {index_name}")
+        logger.info(f"[{request_id}] FAISS index: {rag_analysis.get('faiss_index_name')}")
 
         # Basic metrics
         basic_metrics = {
             "word_count": len(text.split()),
-            "page_count": len(reader.pages),
+            "page_count": page_count,
             "character_count": len(text)
         }
         logger.info(f"[{request_id}] Basic metrics calculated: {basic_metrics}")
@@ -340,27 +521,18 @@ async def compare_with_job_description_rag(
     """
     RAG-based JD comparison - uses vector retrieval for accurate matching
     """
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    request_id = format(time.time_ns(), "x")
     logger.info(f"[{request_id}] RAG-based JD comparison request received")
     
-    if not file.filename.endswith('.pdf'):
+    if not is_pdf_filename(file.filename):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    if not rag_engine:
-        raise HTTPException(status_code=500, detail="RAG Engine not configured")
-    
-    contents = await file.read()
-    os.makedirs("uploads", exist_ok=True)
-    path = f"uploads/{file.filename}"
-    
-    with open(path, "wb") as f:
-        f.write(contents)
+    contents = await read_upload(file)
+    if PERSIST_UPLOADS:
+        save_upload(file.filename, contents)
     
     try:
-        reader = PdfReader(path)
-        resume_text = ""
-        for page in reader.pages:
-            resume_text += page.extract_text()
+        resume_text, _ = await asyncio.to_thread(extract_pdf_text, contents)
         
         if not resume_text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from PDF")
@@ -368,11 +540,10 @@ async def compare_with_job_description_rag(
         logger.info(f"[{request_id}] Starting RAG-based JD comparison with FAISS...")
         
         # Use RAG engine with FAISS for grounded analysis
-        index_name = f"jd_comparison_{request_id}"
-        rag_analysis = rag_engine.analyze_with_rag_faiss(resume_text, job_description, index_name=index_name)
+        rag_analysis = await analyze_with_rag(resume_text, job_description)
         
         logger.info(f"[{request_id}] RAG-based JD comparison completed")
-        logger.info(f"[{request_id}] FAISS index saved: {index_name}")
+        logger.info(f"[{request_id}] FAISS index: {rag_analysis.get('faiss_index_name')}")
         
         return {
             "filename": file.filename,
@@ -390,27 +561,18 @@ async def compare_with_job_description(
     job_description: str = Form(...)
 ):
     """Compare resume with job description for ATS matching"""
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    request_id = format(time.time_ns(), "x")
     logger.info(f"[{request_id}] JD comparison request received")
     
-    if not file.filename.endswith('.pdf'):
+    if not is_pdf_filename(file.filename):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    if not os.getenv("OPENAI_API_KEY"):
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
-    
-    contents = await file.read()
-    os.makedirs("uploads", exist_ok=True)
-    path = f"uploads/{file.filename}"
-    
-    with open(path, "wb") as f:
-        f.write(contents)
+    contents = await read_upload(file)
+    if PERSIST_UPLOADS:
+        save_upload(file.filename, contents)
     
     try:
-        reader = PdfReader(path)
-        resume_text = ""
-        for page in reader.pages:
-            resume_text += page.extract_text()
+        resume_text, _ = await asyncio.to_thread(extract_pdf_text, contents)
         
         if not resume_text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from PDF")
@@ -457,7 +619,7 @@ Return JSON with these exact keys:
 
 Be specific and actionable. Return ONLY valid JSON."""
 
-        response = client.chat.completions.create(
+        response = await create_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are an expert ATS system analyzer."},
@@ -467,7 +629,7 @@ Be specific and actionable. Return ONLY valid JSON."""
             response_format={"type": "json_object"}
         )
         
-        analysis = json.loads(response.choices[0].message.content)
+        analysis = orjson.loads(response.choices[0].message.content)
         logger.info(f"[{request_id}] JD comparison completed")
         
         return {
@@ -482,27 +644,18 @@ Be specific and actionable. Return ONLY valid JSON."""
 @app.post("/rewrite-suggestions")
 async def get_rewrite_suggestions(file: UploadFile = File(...)):
     """Generate resume rewriting suggestions using STAR method"""
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    request_id = format(time.time_ns(), "x")
     logger.info(f"[{request_id}] Rewrite suggestions request received")
     
-    if not file.filename.endswith('.pdf'):
+    if not is_pdf_filename(file.filename):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    if not os.getenv("OPENAI_API_KEY"):
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
-    
-    contents = await file.read()
-    os.makedirs("uploads", exist_ok=True)
-    path = f"uploads/{file.filename}"
-    
-    with open(path, "wb") as f:
-        f.write(contents)
+    contents = await read_upload(file)
+    if PERSIST_UPLOADS:
+        save_upload(file.filename, contents)
     
     try:
-        reader = PdfReader(path)
-        resume_text = ""
-        for page in reader.pages:
-            resume_text += page.extract_text()
+        resume_text, _ = await asyncio.to_thread(extract_pdf_text, contents)
         
         if not resume_text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from PDF")
@@ -561,7 +714,7 @@ Return JSON with these exact keys:
 
 Be specific with examples from the actual resume. Return ONLY valid JSON."""
 
-        response = client.chat.completions.create(
+        response = await create_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are an expert resume writer specializing in STAR method and achievement-focused writing."},
@@ -571,7 +724,7 @@ Be specific with examples from the actual resume. Return ONLY valid JSON."""
             response_format={"type": "json_object"}
         )
         
-        suggestions = json.loads(response.choices[0].message.content)
+        suggestions = orjson.loads(response.choices[0].message.content)
         logger.info(f"[{request_id}] Rewrite suggestions generated")
         
         return {
@@ -589,31 +742,22 @@ async def convert_resume_format(
     format_type: str = Form(...)
 ):
     """Convert resume to different formats (ATS-optimized, HR-friendly, role-specific)"""
-    request_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    request_id = format(time.time_ns(), "x")
     logger.info(f"[{request_id}] Format conversion request: {format_type}")
     
-    if not file.filename.endswith('.pdf'):
+    if not is_pdf_filename(file.filename):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    if not os.getenv("OPENAI_API_KEY"):
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
-    
     valid_formats = ["ats-optimized", "hr-friendly", "software-engineer", "data-analyst", "product-manager", "marketing"]
     if format_type not in valid_formats:
         raise HTTPException(status_code=400, detail=f"Invalid format. Choose from: {', '.join(valid_formats)}")
     
-    contents = await file.read()
-    os.makedirs("uploads", exist_ok=True)
-    path = f"uploads/{file.filename}"
-    
-    with open(path, "wb") as f:
-        f.write(contents)
+    contents = await read_upload(file)
+    if PERSIST_UPLOADS:
+        save_upload(file.filename, contents)
     
     try:
-        reader = PdfReader(path)
-        resume_text = ""
-        for page in reader.pages:
-            resume_text += page.extract_text()
+        resume_text, _ = await asyncio.to_thread(extract_pdf_text, contents)
         
         if not resume_text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from PDF")
@@ -671,7 +815,7 @@ Return JSON with these exact keys:
 
 Return ONLY valid JSON."""
 
-        response = client.chat.completions.create(
+        response = await create_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": f"You are an expert resume writer specializing in {format_type} resumes."},
@@ -681,12 +825,10 @@ Return ONLY valid JSON."""
             response_format={"type": "json_object"}
         )
         
-        converted = json.loads(response.choices[0].message.content)
+        converted = orjson.loads(response.choices[0].message.content)
         logger.info(f"[{request_id}] Format conversion completed")
         
         # Generate PDF
-        output_dir = "generated"
-        os.makedirs(output_dir, exist_ok=True)
         output_filename = f"{format_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         output_path = os.path.join(output_dir, output_filename)
         
@@ -738,7 +880,7 @@ Return ONLY valid JSON."""
 @app.get("/download/{filename}")
 async def download_file(filename: str):
     """Download generated resume file"""
-    file_path = os.path.join("generated", filename)
+    file_path = os.path.join(output_dir, filename)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
     return FileResponse(file_path, media_type="application/pdf", filename=filename)
@@ -746,11 +888,9 @@ async def download_file(filename: str):
 @app.get("/faiss-indexes")
 async def list_faiss_indexes():
     """List all saved FAISS indexes"""
-    if not rag_engine:
-        raise HTTPException(status_code=500, detail="RAG Engine not configured")
-    
     try:
-        indexes = rag_engine.list_saved_indexes()
+        async with rag_lock:
+            indexes = await asyncio.to_thread(rag_engine.list_saved_indexes)
         return {
             "total_indexes": len(indexes),
             "indexes": indexes
@@ -762,11 +902,9 @@ async def list_faiss_indexes():
 @app.delete("/faiss-indexes/{index_name}")
 async def delete_faiss_index(index_name: str):
     """Delete a specific FAISS index"""
-    if not rag_engine:
-        raise HTTPException(status_code=500, detail="RAG Engine not configured")
-    
     try:
-        success = rag_engine.delete_index(index_name)
+        async with rag_lock:
+            success = await asyncio.to_thread(rag_engine.delete_index, index_name)
         if success:
             return {"message": f"Index '{index_name}' deleted successfully"}
         else:
@@ -778,29 +916,15 @@ async def delete_faiss_index(index_name: str):
 @app.post("/faiss-indexes/cleanup")
 async def cleanup_old_indexes(days_old: int = 7):
     """Clean up FAISS indexes older than specified days"""
-    if not rag_engine:
-        raise HTTPException(status_code=500, detail="RAG Engine not configured")
-    
     try:
-        from datetime import timedelta
-        
-        indexes = rag_engine.list_saved_indexes()
-        deleted_count = 0
-        cutoff_date = datetime.now() - timedelta(days=days_old)
-        
-        for index in indexes:
-            try:
-                created_at = datetime.fromisoformat(index['created_at'])
-                if created_at < cutoff_date:
-                    if rag_engine.delete_index(index['name']):
-                        deleted_count += 1
-            except Exception as e:
-                logger.warning(f"Error processing index {index['name']}: {e}")
+        async with rag_lock:
+            deleted_count = await asyncio.to_thread(rag_engine.prune_indexes, days_old)
+            remaining_indexes = await asyncio.to_thread(rag_engine.list_saved_indexes)
         
         return {
             "message": f"Cleaned up {deleted_count} old indexes",
             "deleted_count": deleted_count,
-            "remaining_indexes": len(indexes) - deleted_count
+            "remaining_indexes": len(remaining_indexes)
         }
     except Exception as e:
         logger.error(f"Error cleaning up indexes: {str(e)}")
@@ -5,22 +5,46 @@ Uses FAISS for efficient vector storage and retrieval
 """
 
 import os
+import re
+import unicodedata
 from typing import List, Dict, Any, Optional
 from openai import OpenAI
 import numpy as np
 from dataclasses import dataclass, asdict
 import json
 import faiss
-import pickle
-from datetime import datetime
+import yake
+import tiktoken
+import hashlib
+from diskcache import Cache
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from vector_ops import cosine_similarity, cosine_similarity_matrix, top_k_indices
+
+WHITESPACE_RE = re.compile(r"\s+")
+CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0e-\x1f\x7f]")
+
+# Compact per-chunk source codes for vectorized filtering
+SOURCE_IDS = {'resume': 0, 'job_description': 1, 'ats_rules': 2}
+
+SECTION_KEYWORDS = {
+    'summary': ['summary', 'objective', 'profile', 'about'],
+    'experience': ['experience', 'work history', 'employment', 'professional experience'],
+    'education': ['education', 'academic', 'degree'],
+    'skills': ['skills', 'technical skills', 'competencies', 'expertise'],
+    'projects': ['projects', 'portfolio'],
+    'certifications': ['certifications', 'certificates', 'licenses']
+}
+KEYWORD_TO_SECTION = {keyword: section for section, keywords in SECTION_KEYWORDS.items() for keyword in keywords}
+# One alternation scanned by the C regex engine; longest keywords first so the fullest phrase wins
+SECTION_HEADER_RE = re.compile("|".join(re.escape(k) for k in sorted(KEYWORD_TO_SECTION, key=len, reverse=True)))
 
 @dataclass
 class Chunk:
-    """Represents a text chunk with metadata"""
+    """Represents a text chunk with metadata; its embedding lives in RAGEngine._embeddings"""
     text: str
     source: str  # 'resume', 'job_description', 'ats_rules'
     section: str  # 'summary', 'experience', 'skills', etc.
-    embedding: List[float] = None
 
 class RAGEngine:
     """
@@ -28,21 +52,51 @@ class RAGEngine:
     Uses OpenAI embeddings + FAISS for semantic search with persistence
     """
     
+    # Above this many vectors, exact search gives way to an HNSW graph (sublinear, no training)
+    HNSW_THRESHOLD = 4096
+    HNSW_M = 32
+    HNSW_EF_SEARCH = 64
+    
+    # Saved indexes are memory-mapped read-only; IO_FLAG_MMAP_IFC covers flat/SQ codes (faiss >= 1.8)
+    FAISS_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    
+    # Hard cap on chunk size sent for embedding (the model's limit is 8191)
+    MAX_CHUNK_TOKENS = 512
+    
     def __init__(self, api_key: str, index_dir: str = "faiss_indexes"):
         self.client = OpenAI(api_key=api_key)
-        self.chunks: List[Chunk] = []
         self.index_dir = index_dir
+        self.embedding_model = "text-embedding-3-small"
         self.embedding_dim = 1536  # OpenAI text-embedding-3-small dimension
+        self._token_encoding = None  # tiktoken encoding, set by load_token_encoding
+        
+        # Chunks are stored column-wise: row i of each array belongs to self.chunks[i]
+        self._clear_chunks()
         
         # Create index directory
         os.makedirs(self.index_dir, exist_ok=True)
         
+        # Persistent embedding cache: sha256(model|text) -> float16 vector bytes.
+        # diskcache is thread- and process-safe, so uvicorn workers share it; size-bounded with eviction
+        self._emb_cache = Cache(os.path.join(self.index_dir, "embedding_cache"))
+        
         # Initialize FAISS index
         self.faiss_index: Optional[faiss.Index] = None
         self.index_to_chunk_map: Dict[int, int] = {}  # FAISS index -> chunk index
+        self._faiss_source_ids = np.empty(0, dtype=np.int8)  # FAISS index -> SOURCE_IDS code
+        self._faiss_mmapped = False  # faiss_index is a read-only view of a saved file
         
-        # ATS scoring rubrics and rules
+        # Embeddings waiting for flush_index, which adds them to FAISS in one call
+        self._pending_embeddings: List[np.ndarray] = []
+        self._pending_chunk_indices: List[int] = []
+        
+        # ATS scoring rubrics and rules; clear_index keeps them indexed
         self.ats_rules = self._load_ats_rules()
+        self._rule_chunks = self._chunk_ats_rules()
+        self._rule_embeddings: Optional[np.ndarray] = None  # embedded on first use, then reused
+        
+        # Local keyword extractor (no API call), reused across requests
+        self._keyword_extractor = yake.KeywordExtractor(lan="en", n=2, top=30)
         
         # Load existing index if available
         self._load_index()
@@ -108,145 +162,247 @@ class RAGEngine:
         """
         Split text into semantic chunks
         """
-        chunks = []
-        
         # Split by paragraphs or sections
-        paragraphs = text.split('\n\n')
+        return self.chunk_text_from_paras(text.split('\n\n'), source, section, chunk_size)
+    
+    def chunk_text_from_paras(self, paragraphs: List[str], source: str, section: str = "general", chunk_size: int = 500) -> List[Chunk]:
+        """
+        Group already-split paragraphs into chunks of up to chunk_size characters
+        """
+        texts = []
         
         current_chunk = ""
         for para in paragraphs:
             if len(current_chunk) + len(para) < chunk_size:
                 current_chunk += para + "\n\n"
             else:
-                if current_chunk.strip():
-                    chunks.append(Chunk(
-                        text=current_chunk.strip(),
-                        source=source,
-                        section=section
-                    ))
+                texts.append(current_chunk)
                 current_chunk = para + "\n\n"
         
         # Add remaining chunk
-        if current_chunk.strip():
-            chunks.append(Chunk(
-                text=current_chunk.strip(),
-                source=source,
-                section=section
-            ))
+        texts.append(current_chunk)
+        
+        # Normalize before embedding and split anything over the token cap
+        chunks = []
+        for text in texts:
+            for piece in self._split_by_tokens(self._normalize_text(text)):
+                chunks.append(Chunk(text=piece, source=source, section=section))
         
         return chunks
     
-    def get_embedding(self, text: str) -> List[float]:
+    def _normalize_text(self, text: str) -> str:
+        """NFC-normalize, drop control characters and collapse whitespace"""
+        text = CONTROL_CHARS_RE.sub("", unicodedata.normalize("NFC", text))
+        return WHITESPACE_RE.sub(" ", text).strip()
+    
+    def load_token_encoding(self) -> bool:
+        """
+        Load the embedding model's tokenizer (may download its BPE file).
+        Call outside the request path; failures are not cached so the caller can retry
+        """
+        if self._token_encoding is not None:
+            return True
+        try:
+            self._token_encoding = tiktoken.encoding_for_model(self.embedding_model)
+        except Exception as e:
+            print(f"⚠️ Could not load tokenizer, splitting long chunks by characters: {e}")
+            return False
+        print(f"✅ Loaded tokenizer for {self.embedding_model}")
+        return True
+    
+    def _split_by_tokens(self, text: str) -> List[str]:
+        """
+        Split text into pieces of at most MAX_CHUNK_TOKENS tokens once the tokenizer is loaded;
+        until then, into pieces of about MAX_CHUNK_TOKENS tokens by character count (not guaranteed)
+        """
+        if not text:
+            return []
+        
+        # Every token covers at least one UTF-8 byte, so short text needs no tokenizing
+        if len(text.encode('utf-8')) <= self.MAX_CHUNK_TOKENS:
+            return [text]
+        
+        # Never load the tokenizer here: it can block on a download while callers hold rag_lock
+        encoding = self._token_encoding
+        if encoding is None:
+            # Roughly 4 characters per token for English text
+            step = self.MAX_CHUNK_TOKENS * 4
+            return [text[i:i + step] for i in range(0, len(text), step)]
+        
+        tokens = encoding.encode(text)
+        step = self.MAX_CHUNK_TOKENS
+        return [encoding.decode(tokens[i:i + step]) for i in range(0, len(tokens), step)]
+    
+    def get_embedding(self, text: str) -> np.ndarray:
         """Get embedding vector for text using OpenAI"""
-        response = self.client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
+        return self.get_embeddings_batch([text])[0]
     
-    def embed_chunks(self, chunks: List[Chunk]) -> List[Chunk]:
-        """Generate embeddings for all chunks"""
-        for chunk in chunks:
-            chunk.embedding = self.get_embedding(chunk.text)
-        return chunks
+    def _embedding_cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.embedding_model}|{text}".encode()).hexdigest()
+    
+    def get_embeddings_batch(self, texts: List[str], batch_size: int = 96) -> List[np.ndarray]:
+        """
+        Get float16 embedding vectors for many texts, one API request per batch_size texts.
+        Texts already in the embedding cache are not sent to the API.
+        """
+        keys = [self._embedding_cache_key(text) for text in texts]
+        vectors = [self._emb_cache.get(key) for key in keys]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        for start in range(0, len(misses), batch_size):
+            batch = misses[start:start + batch_size]
+            response = self.client.embeddings.create(
+                model=self.embedding_model,
+                input=[texts[i] for i in batch]
+            )
+            with self._emb_cache.transact():
+                for i, d in zip(batch, response.data):
+                    vectors[i] = np.asarray(d.embedding, dtype=np.float16).tobytes()
+                    self._emb_cache.set(keys[i], vectors[i])
+        
+        return [np.frombuffer(vector, dtype=np.float16) for vector in vectors]
+    
+    def embed_chunks(self, chunks: List[Chunk]) -> np.ndarray:
+        """Generate embeddings for all chunks in batched requests, one float16 row per chunk"""
+        embeddings = self.get_embeddings_batch([chunk.text for chunk in chunks])
+        return np.array(embeddings, dtype=np.float16).reshape(len(chunks), self.embedding_dim)
     
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
-        vec1 = np.array(vec1)
-        vec2 = np.array(vec2)
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+        return cosine_similarity(vec1, vec2)
+    
+    def _clear_chunks(self):
+        """Drop all chunks and their embedding rows"""
+        self.chunks: List[Chunk] = []
+        self._embeddings = np.empty((0, self.embedding_dim), dtype=np.float16)  # raw float16 vectors
+        self._source_ids = np.empty(0, dtype=np.int8)  # SOURCE_IDS code per chunk
+        
+        # float32 copy of self._embeddings for retrieval, rebuilt lazily
+        self._emb_matrix: Optional[np.ndarray] = None
+        self._emb_dirty = True
+    
+    def _add_chunks(self, chunks: List[Chunk], embeddings: np.ndarray) -> List[int]:
+        """Append chunks with their embedding rows and return their indices in self.chunks"""
+        start = len(self.chunks)
+        self.chunks.extend(chunks)
+        self._embeddings = np.concatenate([self._embeddings, embeddings])
+        self._source_ids = np.concatenate([self._source_ids, self._encode_sources(chunks)])
+        self._emb_dirty = True
+        return list(range(start, len(self.chunks)))
+    
+    def _encode_sources(self, chunks: List[Chunk]) -> np.ndarray:
+        """Map chunk sources to their int8 SOURCE_IDS codes"""
+        return np.array([SOURCE_IDS[chunk.source] for chunk in chunks], dtype=np.int8)
+    
+    def _build_embedding_matrix(self):
+        """Build the float32 retrieval matrix from the float16 embeddings"""
+        self._emb_matrix = self._embeddings.astype(np.float32)
+        self._emb_dirty = False
     
     def retrieve_relevant_chunks(self, query: str, top_k: int = 5, source_filter: str = None) -> List[Chunk]:
         """
-        Retrieve most relevant chunks for a query
+        Retrieve most relevant chunks for a query.
+        Scores every chunk with one batched cosine kernel instead of a Python loop.
         """
-        query_embedding = self.get_embedding(query)
-        
-        # Filter chunks by source if specified
-        filtered_chunks = self.chunks
-        if source_filter:
-            filtered_chunks = [c for c in self.chunks if c.source == source_filter]
-        
-        # Calculate similarities
-        similarities = []
-        for chunk in filtered_chunks:
-            if chunk.embedding:
-                sim = self.cosine_similarity(query_embedding, chunk.embedding)
-                similarities.append((chunk, sim))
-        
-        # Sort by similarity and return top_k
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return [chunk for chunk, _ in similarities[:top_k]]
+        if self._emb_dirty:
+            self._build_embedding_matrix()
+        
+        # Filter chunks by source if specified; only matching rows are scored
+        rows = np.flatnonzero(self._source_ids == SOURCE_IDS.get(source_filter, -1)) if source_filter else None
+        matrix = self._emb_matrix[rows] if rows is not None else self._emb_matrix
+        k = min(top_k, len(matrix))
+        if k <= 0:
+            return []
+        
+        query_vector = np.asarray(self.get_embedding(query), dtype=np.float32)
+        scores = cosine_similarity_matrix(matrix, query_vector)
+        
+        top = top_k_indices(scores, k)
+        if rows is not None:
+            top = rows[top]
+        return [self.chunks[i] for i in top]
     
-    def index_resume(self, resume_text: str):
-        """Index resume by chunking and embedding"""
+    def _chunk_resume(self, resume_text: str) -> List[Chunk]:
+        """Chunk resume text section by section"""
         # Detect sections
         sections = self._detect_sections(resume_text)
         
-        for section_name, section_text in sections.items():
-            chunks = self.chunk_text(section_text, source="resume", section=section_name)
-            chunks = self.embed_chunks(chunks)
-            self.chunks.extend(chunks)
+        chunks = []
+        for section_name, section_paras in sections.items():
+            chunks.extend(self.chunk_text_from_paras(section_paras, source="resume", section=section_name))
+        return chunks
+    
+    def index_resume(self, resume_text: str):
+        """Index resume by chunking and embedding"""
+        chunks = self._chunk_resume(resume_text)
+        self._add_chunks(chunks, self.embed_chunks(chunks))
     
     def index_job_description(self, jd_text: str):
         """Index job description by chunking and embedding"""
         chunks = self.chunk_text(jd_text, source="job_description", section="requirements")
-        chunks = self.embed_chunks(chunks)
-        self.chunks.extend(chunks)
+        self._add_chunks(chunks, self.embed_chunks(chunks))
     
-    def index_ats_rules(self):
-        """Index ATS rules for retrieval"""
+    def _chunk_ats_rules(self) -> List[Chunk]:
+        """Chunk ATS rules, one category at a time"""
+        chunks = []
         for rule_category in self.ats_rules:
             rule_text = f"{rule_category['category']}: " + " ".join(rule_category['rules'])
-            chunks = self.chunk_text(rule_text, source="ats_rules", section=rule_category['category'])
-            chunks = self.embed_chunks(chunks)
-            self.chunks.extend(chunks)
+            chunks.extend(self.chunk_text(rule_text, source="ats_rules", section=rule_category['category']))
+        return chunks
     
-    def _detect_sections(self, text: str) -> Dict[str, str]:
-        """Detect common resume sections"""
+    def _get_rule_embeddings(self) -> np.ndarray:
+        """Embed the ATS rule chunks once and reuse them for every request"""
+        if self._rule_embeddings is None:
+            self._rule_embeddings = self.embed_chunks(self._rule_chunks)
+        return self._rule_embeddings
+    
+    def index_ats_rules(self):
+        """Index ATS rules for retrieval"""
+        self._add_chunks(self._rule_chunks, self._get_rule_embeddings())
+    
+    def _detect_sections(self, text: str) -> Dict[str, List[str]]:
+        """Detect common resume sections, each as a list of paragraphs"""
         sections = {}
         current_section = "summary"
-        current_text = []
+        current_paras = []
+        current_lines = []
         
         lines = text.split('\n')
         
-        section_keywords = {
-            'summary': ['summary', 'objective', 'profile', 'about'],
-            'experience': ['experience', 'work history', 'employment', 'professional experience'],
-            'education': ['education', 'academic', 'degree'],
-            'skills': ['skills', 'technical skills', 'competencies', 'expertise'],
-            'projects': ['projects', 'portfolio'],
-            'certifications': ['certifications', 'certificates', 'licenses']
-        }
-        
         for line in lines:
-            line_lower = line.lower().strip()
-            
-            # Check if line is a section header
-            section_found = False
-            for section_name, keywords in section_keywords.items():
-                if any(keyword in line_lower for keyword in keywords) and len(line.split()) < 5:
-                    # Save previous section
-                    if current_text:
-                        sections[current_section] = '\n'.join(current_text)
-                    
-                    # Start new section
-                    current_section = section_name
-                    current_text = []
-                    section_found = True
-                    break
-            
-            if not section_found and line.strip():
-                current_text.append(line)
+            # Check if line is a section header (short line containing a section keyword)
+            match = SECTION_HEADER_RE.search(line.lower()) if len(line.split()) < 5 else None
+            if match:
+                # Save previous section
+                if current_lines:
+                    current_paras.append('\n'.join(current_lines))
+                if current_paras:
+                    sections[current_section] = current_paras
+                
+                # Start new section
+                current_section = KEYWORD_TO_SECTION[match.group()]
+                current_paras = []
+                current_lines = []
+            elif line.strip():
+                current_lines.append(line)
+            elif current_lines:
+                # A blank line ends the paragraph
+                current_paras.append('\n'.join(current_lines))
+                current_lines = []
         
         # Save last section
-        if current_text:
-            sections[current_section] = '\n'.join(current_text)
+        if current_lines:
+            current_paras.append('\n'.join(current_lines))
+        if current_paras:
+            sections[current_section] = current_paras
         
         return sections
     
-    def extract_keywords(self, text: str) -> List[str]:
-        """Extract important keywords from text"""
+    def extract_keywords(self, text: str, use_llm: bool = False) -> List[str]:
+        """Extract important keywords from text, locally with YAKE unless use_llm is set"""
+        if not use_llm:
+            return [keyword for keyword, _ in self._keyword_extractor.extract_keywords(text)]
+        
         # Use OpenAI to extract keywords
         response = self.client.chat.completions.create(
             model="gpt-4o-mini",
@@ -266,7 +422,7 @@ class RAGEngine:
         Perform RAG-based ATS analysis
         """
         # Clear previous chunks
-        self.chunks = []
+        self._clear_chunks()
         
         # Index documents
         self.index_resume(resume_text)
@@ -315,7 +471,13 @@ class RAGEngine:
     
     def _generate_analysis(self, context: str, has_jd: bool) -> Dict[str, Any]:
         """Generate analysis using LLM with retrieved context"""
+        response = self.client.chat.completions.create(**self.build_analysis_request(context, has_jd))
         
+        analysis = json.loads(response.choices[0].message.content)
+        return analysis
+    
+    def build_analysis_request(self, context: str, has_jd: bool) -> Dict[str, Any]:
+        """Chat completion arguments for an analysis grounded in the retrieved context"""
         if has_jd:
             prompt = f"""You are an AI Resume ATS Engine with RAG. Analyze the resume against the job description using ONLY the retrieved context below.
 
@@ -387,45 +549,73 @@ Provide analysis in JSON format with these keys:
 
 Return ONLY valid JSON."""
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [
                 {"role": "system", "content": "You are an expert ATS analyzer. Use ONLY the retrieved context. Never hallucinate."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        analysis = json.loads(response.choices[0].message.content)
-        return analysis
+            "temperature": 0.3,
+            "response_format": {"type": "json_object"}
+        }
+    
+    def close(self):
+        """Close the embedding cache"""
+        self._emb_cache.close()
     
     def clear_index(self):
-        """Clear all indexed chunks"""
-        self.chunks = []
+        """Clear all indexed documents, keeping the ATS rule chunks"""
+        self._clear_chunks()
         self.faiss_index = None
         self.index_to_chunk_map = {}
+        self._faiss_source_ids = np.empty(0, dtype=np.int8)
+        self._faiss_mmapped = False
+        self._pending_embeddings = []
+        self._pending_chunk_indices = []
+        
+        rule_embeddings = self._get_rule_embeddings()
+        rule_indices = self._add_chunks(self._rule_chunks, rule_embeddings)
+        if rule_indices:
+            self._add_to_faiss_index(rule_embeddings, rule_indices)
     
     def _get_index_path(self, index_name: str = "default") -> tuple:
-        """Get paths for FAISS index and metadata"""
+        """Get paths for FAISS index, metadata and embeddings"""
         faiss_path = os.path.join(self.index_dir, f"{index_name}.faiss")
-        metadata_path = os.path.join(self.index_dir, f"{index_name}_metadata.pkl")
-        return faiss_path, metadata_path
+        metadata_path = os.path.join(self.index_dir, f"{index_name}_metadata.json")
+        embeddings_path = os.path.join(self.index_dir, f"{index_name}_emb.npy")
+        return faiss_path, metadata_path, embeddings_path
     
     def _load_index(self, index_name: str = "default") -> bool:
         """Load FAISS index and metadata from disk"""
-        faiss_path, metadata_path = self._get_index_path(index_name)
+        faiss_path, metadata_path, embeddings_path = self._get_index_path(index_name)
         
-        if os.path.exists(faiss_path) and os.path.exists(metadata_path):
+        if os.path.exists(faiss_path) and os.path.exists(metadata_path) and os.path.exists(embeddings_path):
             try:
-                # Load FAISS index
-                self.faiss_index = faiss.read_index(faiss_path)
+                # Load FAISS index; pages are read on demand and shared between workers
+                try:
+                    self.faiss_index = faiss.read_index(faiss_path, self.FAISS_MMAP_FLAGS)
+                    self._faiss_mmapped = True
+                except RuntimeError:
+                    # Index type without mmap support
+                    self.faiss_index = faiss.read_index(faiss_path)
+                    self._faiss_mmapped = False
+                if isinstance(self.faiss_index, faiss.IndexHNSW):
+                    # Search-time parameter, not persisted with the index
+                    self.faiss_index.hnsw.efSearch = self.HNSW_EF_SEARCH
                 
                 # Load metadata
-                with open(metadata_path, 'rb') as f:
-                    metadata = pickle.load(f)
-                    self.chunks = metadata['chunks']
-                    self.index_to_chunk_map = metadata['index_to_chunk_map']
+                with open(metadata_path, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+                self._clear_chunks()
+                self.chunks = [Chunk(**chunk) for chunk in metadata['chunks']]
+                self._source_ids = self._encode_sources(self.chunks)
+                self.index_to_chunk_map = {int(k): v for k, v in metadata['index_to_chunk_map'].items()}
+                self._faiss_source_ids = self._source_ids[[self.index_to_chunk_map[i] for i in range(self.faiss_index.ntotal)]]
+                self._pending_embeddings = []
+                self._pending_chunk_indices = []
+                
+                # Memory-mapped: pages are read on demand instead of copied up front
+                self._embeddings = np.load(embeddings_path, mmap_mode='r')
                 
                 print(f"✅ Loaded FAISS index: {len(self.chunks)} chunks")
                 return True
@@ -436,26 +626,33 @@ Return ONLY valid JSON."""
     
     def _save_index(self, index_name: str = "default"):
         """Save FAISS index and metadata to disk"""
+        self.flush_index()
         if self.faiss_index is None or len(self.chunks) == 0:
             print("⚠️ No index to save")
             return
         
-        faiss_path, metadata_path = self._get_index_path(index_name)
+        faiss_path, metadata_path, embeddings_path = self._get_index_path(index_name)
         
         try:
+            # The target files may be the ones currently mapped
+            self._ensure_index_in_memory()
+            
             # Save FAISS index
             faiss.write_index(self.faiss_index, faiss_path)
             
+            # Save embeddings as one float16 array, row i belonging to chunk i
+            np.save(embeddings_path, self._embeddings)
+            
             # Save metadata
             metadata = {
-                'chunks': self.chunks,
+                'chunks': [asdict(chunk) for chunk in self.chunks],
                 'index_to_chunk_map': self.index_to_chunk_map,
                 'created_at': datetime.now().isoformat(),
                 'num_chunks': len(self.chunks)
             }
             
-            with open(metadata_path, 'wb') as f:
-                pickle.dump(metadata, f)
+            with open(metadata_path, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f)
             
             print(f"✅ Saved FAISS index: {faiss_path}")
             print(f"✅ Saved metadata: {metadata_path}")
@@ -463,16 +660,52 @@ Return ONLY valid JSON."""
         except Exception as e:
             print(f"❌ Error saving index: {e}")
     
-    def _initialize_faiss_index(self):
-        """Initialize a new FAISS index"""
-        # Use IndexFlatL2 for exact search (can be upgraded to IndexIVFFlat for speed)
-        self.faiss_index = faiss.IndexFlatL2(self.embedding_dim)
-        print(f"🔧 Initialized new FAISS index (dim={self.embedding_dim})")
+    def _initialize_faiss_index(self, expected_size: int = 0):
+        """Initialize a new FAISS index sized for the expected number of vectors"""
+        # Vectors are L2-normalized on insert, so inner product scores are cosine similarities.
+        # Stored as fp16 (half the memory of float32); needs no training
+        if expected_size > self.HNSW_THRESHOLD:
+            self.faiss_index = faiss.IndexHNSWSQ(self.embedding_dim, faiss.ScalarQuantizer.QT_fp16, self.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            self.faiss_index.hnsw.efSearch = self.HNSW_EF_SEARCH
+            print(f"🔧 Initialized new FAISS HNSW index (dim={self.embedding_dim}, M={self.HNSW_M})")
+        else:
+            # Exact search is fastest for small sets
+            self.faiss_index = faiss.IndexScalarQuantizer(self.embedding_dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+            print(f"🔧 Initialized new FAISS index (dim={self.embedding_dim})")
+    
+    def _ensure_index_in_memory(self):
+        """Copy a memory-mapped FAISS index and embedding matrix into RAM"""
+        if self._faiss_mmapped:
+            # A mapped index cannot grow; round-trip through a buffer to get owned storage
+            self.faiss_index = faiss.deserialize_index(faiss.serialize_index(self.faiss_index))
+            if isinstance(self.faiss_index, faiss.IndexHNSW):
+                self.faiss_index.hnsw.efSearch = self.HNSW_EF_SEARCH
+            self._faiss_mmapped = False
+        if isinstance(self._embeddings, np.memmap):
+            self._embeddings = np.array(self._embeddings)
     
     def _add_to_faiss_index(self, embeddings: np.ndarray, chunk_indices: List[int]):
-        """Add embeddings to FAISS index"""
+        """Queue embeddings for the FAISS index; flush_index adds them"""
+        self._pending_embeddings.append(embeddings)
+        self._pending_chunk_indices.extend(chunk_indices)
+    
+    def flush_index(self):
+        """Add all queued embeddings to the FAISS index in a single add() call"""
+        if not self._pending_embeddings:
+            return
+        
+        embeddings = np.vstack(self._pending_embeddings).astype(np.float32, copy=False)
+        chunk_indices = self._pending_chunk_indices
+        self._pending_embeddings = []
+        self._pending_chunk_indices = []
+        
+        # Sized from the whole batch, so the HNSW threshold sees every queued vector
         if self.faiss_index is None:
-            self._initialize_faiss_index()
+            self._initialize_faiss_index(expected_size=len(embeddings))
+        self._ensure_index_in_memory()
+        
+        # Normalize once at insert so inner product == cosine similarity
+        faiss.normalize_L2(embeddings)
         
         # Add to FAISS
         start_idx = self.faiss_index.ntotal
@@ -481,12 +714,14 @@ Return ONLY valid JSON."""
         # Update mapping
         for i, chunk_idx in enumerate(chunk_indices):
             self.index_to_chunk_map[start_idx + i] = chunk_idx
+        self._faiss_source_ids = np.concatenate([self._faiss_source_ids, self._source_ids[chunk_indices]])
     
     def retrieve_relevant_chunks_faiss(self, query: str, top_k: int = 5, source_filter: str = None) -> List[Chunk]:
         """
         Retrieve most relevant chunks using FAISS
         Much faster than cosine similarity for large datasets
         """
+        self.flush_index()
         if self.faiss_index is None or self.faiss_index.ntotal == 0:
             print("⚠️ FAISS index is empty, falling back to standard retrieval")
             return self.retrieve_relevant_chunks(query, top_k, source_filter)
@@ -494,11 +729,24 @@ Return ONLY valid JSON."""
         # Get query embedding
         query_embedding = self.get_embedding(query)
         query_vector = np.array([query_embedding], dtype=np.float32)
+        faiss.normalize_L2(query_vector)
         
-        # Search in FAISS
-        distances, indices = self.faiss_index.search(query_vector, min(top_k * 2, self.faiss_index.ntotal))
-        
-        # Map back to chunks and apply filter
+        # Restrict the search to the filtered source inside FAISS, so exactly top_k come back
+        params = None
+        candidates = self.faiss_index.ntotal
+        if source_filter:
+            ids = np.flatnonzero(self._faiss_source_ids == SOURCE_IDS.get(source_filter, -1))
+            selector = faiss.IDSelectorArray(ids)
+            params = faiss.SearchParameters(sel=selector)
+            candidates = len(ids)
+        k = min(top_k, candidates)
+        if k <= 0:
+            return []
+        
+        # Search in FAISS; scores are cosine similarities, higher is better
+        scores, indices = self.faiss_index.search(query_vector, k, params=params)
+        
+        # Map back to chunks
         relevant_chunks = []
         for idx in indices[0]:
             if idx == -1:  # FAISS returns -1 for empty slots
@@ -506,69 +754,39 @@ Return ONLY valid JSON."""
             
             chunk_idx = self.index_to_chunk_map.get(int(idx))
             if chunk_idx is not None and chunk_idx < len(self.chunks):
-                chunk = self.chunks[chunk_idx]
-                
-                # Apply source filter
-                if source_filter is None or chunk.source == source_filter:
-                    relevant_chunks.append(chunk)
-                
-                if len(relevant_chunks) >= top_k:
-                    break
+                relevant_chunks.append(self.chunks[chunk_idx])
         
         return relevant_chunks
     
+    def _add_chunks_to_faiss(self, chunks: List[Chunk], embeddings: np.ndarray):
+        """Add embedded chunks to self.chunks and the FAISS index"""
+        chunk_indices = self._add_chunks(chunks, embeddings)
+        if chunks:
+            self._add_to_faiss_index(embeddings, chunk_indices)
+    
     def index_resume_with_faiss(self, resume_text: str, save: bool = True, index_name: str = "default"):
         """Index resume using FAISS for persistent storage"""
         # Clear previous index
         self.clear_index()
         
-        # Detect sections
-        sections = self._detect_sections(resume_text)
-        
-        all_embeddings = []
-        chunk_indices = []
+        # Embed every section's chunks in one batched request
+        chunks = self._chunk_resume(resume_text)
+        self._add_chunks_to_faiss(chunks, self.embed_chunks(chunks))
         
-        for section_name, section_text in sections.items():
-            chunks = self.chunk_text(section_text, source="resume", section=section_name)
-            
-            for chunk in chunks:
-                # Generate embedding
-                chunk.embedding = self.get_embedding(chunk.text)
-                self.chunks.append(chunk)
-                
-                # Collect for batch FAISS insertion
-                all_embeddings.append(chunk.embedding)
-                chunk_indices.append(len(self.chunks) - 1)
-        
-        # Add to FAISS index
-        if all_embeddings:
-            embeddings_array = np.array(all_embeddings, dtype=np.float32)
-            self._add_to_faiss_index(embeddings_array, chunk_indices)
+        self.flush_index()
         
         # Save to disk
         if save:
             self._save_index(index_name)
         
-        print(f"✅ Indexed resume: {len(self.chunks)} chunks")
+        print(f"✅ Indexed resume: {len(chunks)} chunks")
     
     def index_job_description_with_faiss(self, jd_text: str, save: bool = True, index_name: str = "default"):
         """Index job description using FAISS"""
         chunks = self.chunk_text(jd_text, source="job_description", section="requirements")
+        self._add_chunks_to_faiss(chunks, self.embed_chunks(chunks))
         
-        all_embeddings = []
-        chunk_indices = []
-        
-        for chunk in chunks:
-            chunk.embedding = self.get_embedding(chunk.text)
-            self.chunks.append(chunk)
-            
-            all_embeddings.append(chunk.embedding)
-            chunk_indices.append(len(self.chunks) - 1)
-        
-        # Add to FAISS index
-        if all_embeddings:
-            embeddings_array = np.array(all_embeddings, dtype=np.float32)
-            self._add_to_faiss_index(embeddings_array, chunk_indices)
+        self.flush_index()
         
         # Save to disk
         if save:
@@ -576,26 +794,65 @@ Return ONLY valid JSON."""
         
         print(f"✅ Indexed JD: {len(chunks)} chunks")
     
+    def content_index_name(self, resume_text: str, job_description: str = None) -> str:
+        """
+        Index name derived from the resume and job description text and the chunk splitting mode,
+        so indexes split by characters before the tokenizer loaded are not reused afterwards
+        """
+        split_mode = "chars" if self._token_encoding is None else "tokens"
+        return hashlib.sha256(f"{split_mode}||{resume_text}||{job_description or ''}".encode()).hexdigest()[:16]
+    
     def analyze_with_rag_faiss(self, resume_text: str, job_description: str = None, index_name: str = None) -> Dict[str, Any]:
         """
         Perform RAG-based ATS analysis using FAISS
         """
-        # Generate unique index name if not provided
-        if index_name is None:
-            index_name = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        prepared = self.prepare_rag_analysis(resume_text, job_description, index_name)
         
-        # Clear and index documents
-        self.clear_index()
-        
-        # Index resume
-        self.index_resume_with_faiss(resume_text, save=True, index_name=index_name)
+        # Generate analysis using retrieved context
+        response = self.client.chat.completions.create(**prepared['request'])
+        analysis = json.loads(response.choices[0].message.content)
         
-        # Index job description if provided
-        if job_description:
-            self.index_job_description_with_faiss(job_description, save=True, index_name=index_name)
+        # Add metadata
+        analysis['faiss_index_name'] = prepared['faiss_index_name']
+        analysis['total_chunks_indexed'] = prepared['total_chunks_indexed']
         
-        # Index ATS rules
-        self.index_ats_rules()
+        return analysis
+    
+    def prepare_rag_analysis(self, resume_text: str, job_description: str = None, index_name: str = None) -> Dict[str, Any]:
+        """
+        Index documents and retrieve context with FAISS, returning the chat completion
+        arguments for the analysis so callers can run the LLM call outside any engine lock
+        """
+        # Name the index after its content, so the same resume + JD reuses the saved index.
+        # A caller-supplied name says nothing about what was indexed under it, so always reindex
+        reusable = index_name is None
+        if reusable:
+            index_name = self.content_index_name(resume_text, job_description)
+        
+        if reusable and self._load_index(index_name) and self.faiss_index.ntotal > 0:
+            print(f"♻️ Reusing saved index: {index_name}")
+        else:
+            # Clear and index documents
+            self.clear_index()
+            
+            resume_chunks = self._chunk_resume(resume_text)
+            jd_chunks = self.chunk_text(job_description, source="job_description", section="requirements") if job_description else []
+            queries = ["resume content", "job requirements", "ATS scoring rules"]
+            
+            # Resume, JD and retrieval query embeddings are independent requests, so send them
+            # concurrently; the query vectors land in the embedding cache for the searches below
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                resume_future = pool.submit(self.embed_chunks, resume_chunks)
+                jd_future = pool.submit(self.embed_chunks, jd_chunks)
+                query_future = pool.submit(self.get_embeddings_batch, queries)
+                self._add_chunks_to_faiss(resume_chunks, resume_future.result())
+                self._add_chunks_to_faiss(jd_chunks, jd_future.result())
+                query_future.result()
+            self.flush_index()
+            print(f"✅ Indexed resume: {len(resume_chunks)} chunks, JD: {len(jd_chunks)} chunks")
+            
+            # ATS rules are already indexed by clear_index
+            self._save_index(index_name)
         
         # Retrieve relevant context using FAISS
         resume_chunks = self.retrieve_relevant_chunks_faiss("resume content", top_k=10, source_filter="resume")
@@ -610,14 +867,11 @@ Return ONLY valid JSON."""
         # Build context for LLM
         context = self._build_context(resume_chunks, jd_chunks, ats_rule_chunks)
         
-        # Generate analysis using retrieved context
-        analysis = self._generate_analysis(context, job_description is not None)
-        
-        # Add metadata
-        analysis['faiss_index_name'] = index_name
-        analysis['total_chunks_indexed'] = len(self.chunks)
-        
-        return analysis
+        return {
+            'request': self.build_analysis_request(context, job_description is not None),
+            'faiss_index_name': index_name,
+            'total_chunks_indexed': len(self.chunks)
+        }
     
     def list_saved_indexes(self) -> List[Dict[str, Any]]:
         """List all saved FAISS indexes"""
@@ -627,13 +881,13 @@ Return ONLY valid JSON."""
             return indexes
         
         for filename in os.listdir(self.index_dir):
-            if filename.endswith('_metadata.pkl'):
+            if filename.endswith('_metadata.json'):
                 metadata_path = os.path.join(self.index_dir, filename)
                 try:
-                    with open(metadata_path, 'rb') as f:
-                        metadata = pickle.load(f)
+                    with open(metadata_path, 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
                         indexes.append({
-                            'name': filename.replace('_metadata.pkl', ''),
+                            'name': filename.replace('_metadata.json', ''),
                             'num_chunks': metadata.get('num_chunks', 0),
                             'created_at': metadata.get('created_at', 'Unknown'),
                             'path': metadata_path
@@ -645,15 +899,26 @@ Return ONLY valid JSON."""
     
     def delete_index(self, index_name: str) -> bool:
         """Delete a saved FAISS index"""
-        faiss_path, metadata_path = self._get_index_path(index_name)
-        
         try:
-            if os.path.exists(faiss_path):
-                os.remove(faiss_path)
-            if os.path.exists(metadata_path):
-                os.remove(metadata_path)
+            for path in self._get_index_path(index_name):
+                if os.path.exists(path):
+                    os.remove(path)
             print(f"✅ Deleted index: {index_name}")
             return True
         except Exception as e:
             print(f"❌ Error deleting index: {e}")
             return False
+    
+    def prune_indexes(self, days_old: int = 7) -> int:
+        """Delete saved indexes created more than days_old days ago; returns the number deleted"""
+        cutoff_date = datetime.now() - timedelta(days=days_old)
+        deleted_count = 0
+        
+        for index in self.list_saved_indexes():
+            try:
+                if datetime.fromisoformat(index['created_at']) < cutoff_date and self.delete_index(index['name']):
+                    deleted_count += 1
+            except Exception as e:
+                print(f"⚠️ Error pruning index {index['name']}: {e}")
+        
+        return deleted_count
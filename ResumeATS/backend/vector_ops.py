@@ -0,0 +1,81 @@
+"""
+Vector math for RAG retrieval
+Uses SimSIMD's fused dot/norm kernels when installed, then a Numba kernel, then NumPy
+"""
+
+import numpy as np
+
+try:
+    import simsimd
+    HAS_SIMSIMD = True
+except ImportError:
+    simsimd = None
+    HAS_SIMSIMD = False
+
+# The Numba kernel is only a fallback, so it is not imported or compiled when SimSIMD is present
+numba = None
+HAS_NUMBA = False
+if not HAS_SIMSIMD:
+    try:
+        import numba
+        HAS_NUMBA = True
+    except ImportError:
+        pass
+
+if HAS_NUMBA:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _cosine_similarity_matrix_jit(refs, query):
+        """Fused dot/norm over each row of refs, rows split across threads"""
+        query_norm = np.sqrt(np.sum(query * query))
+        scores = np.empty(refs.shape[0], dtype=np.float32)
+        for i in numba.prange(refs.shape[0]):
+            dot = 0.0
+            norm = 0.0
+            for j in range(refs.shape[1]):
+                dot += refs[i, j] * query[j]
+                norm += refs[i, j] * refs[i, j]
+            scores[i] = dot / (np.sqrt(norm) * query_norm + 1e-12)
+        return scores
+
+    # Compile at import so the first request doesn't pay the JIT cost
+    _cosine_similarity_matrix_jit(np.ones((2, 4), dtype=np.float32), np.ones(4, dtype=np.float32))
+
+
+def _as_vectors(*arrays: np.ndarray) -> list:
+    """Make arrays contiguous with one shared float16/float32 dtype"""
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    dtypes = {a.dtype for a in arrays}
+    if len(dtypes) == 1 and dtypes.pop() in (np.float16, np.float32):
+        return arrays
+    return [a.astype(np.float32) for a in arrays]
+
+
+def cosine_similarity(vec1, vec2) -> float:
+    """Cosine similarity between two vectors"""
+    vec1, vec2 = _as_vectors(np.asarray(vec1), np.asarray(vec2))
+    if HAS_SIMSIMD:
+        return 1.0 - float(simsimd.cosine(vec1, vec2))
+    vec1, vec2 = vec1.astype(np.float32, copy=False), vec2.astype(np.float32, copy=False)
+    return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
+
+
+def cosine_similarity_matrix(refs: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Cosine similarity between each row of refs (N, d) and query (d,)"""
+    refs, query = _as_vectors(refs, query)
+    if len(refs) == 0:
+        return np.empty(0, dtype=np.float32)
+    if HAS_SIMSIMD:
+        return 1.0 - np.asarray(simsimd.cdist(query[None, :], refs, metric="cosine"))[0]
+    refs, query = refs.astype(np.float32, copy=False), query.astype(np.float32, copy=False)
+    if HAS_NUMBA:
+        return _cosine_similarity_matrix_jit(refs, query)
+    return (refs @ query) / (np.linalg.norm(refs, axis=1) * np.linalg.norm(query) + 1e-12)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first; O(N) partition plus an O(k log k) sort"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top])]